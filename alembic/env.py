@@ -1,3 +1,4 @@
+import logging
 import os
 import sys
 from logging.config import fileConfig
@@ -17,7 +18,10 @@ config = context.config
 # Interpret the config file for Python logging.
 # This line sets up loggers basically.
 if config.config_file_name is not None:
-    fileConfig(config.config_file_name)
+    # Don't disable loggers the app configured before running migrations
+    fileConfig(config.config_file_name, disable_existing_loggers=False)
+
+logger = logging.getLogger('alembic.env')
 
 # Import models first
 from models import db
@@ -37,6 +41,14 @@ else:
     db_path = os.path.join(data_dir, 'leetcode.db')
     config.set_main_option('sqlalchemy.url', f'sqlite:///{db_path}')
 
+
+def include_object(object, name, type_, reflected, compare_to):
+    """Keep autogenerate away from the FTS5 search table and its shadow tables"""
+    if type_ == 'table' and name.startswith('problems_fts'):
+        return False
+    return True
+
+
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
@@ -61,6 +73,7 @@ def run_migrations_offline() -> None:
         target_metadata=target_metadata,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
+        include_object=include_object,
     )
 
     with context.begin_transaction():
@@ -81,13 +94,27 @@ def run_migrations_online() -> None:
     )
 
     with connectable.connect() as connection:
+        # The app's connect listener enables foreign keys on every SQLite
+        # connection. Batch migrations recreate tables with DROP TABLE, which
+        # would then cascade-delete the rows referencing them - switch
+        # enforcement off (it can't change inside a transaction) and check
+        # the constraints once the migrations are done instead
+        connection.exec_driver_sql('PRAGMA foreign_keys=OFF')
+        connection.commit()
+
         context.configure(
-            connection=connection, target_metadata=target_metadata
+            connection=connection, target_metadata=target_metadata,
+            include_object=include_object
         )
 
         with context.begin_transaction():
             context.run_migrations()
 
+        violations = connection.exec_driver_sql('PRAGMA foreign_key_check').fetchall()
+        connection.commit()
+        for table, rowid, parent, _ in violations:
+            logger.warning(f"Foreign key violation: {table} row {rowid} references a missing {parent} row")
+
 
 if context.is_offline_mode():
     run_migrations_offline()
@@ -0,0 +1,39 @@
+"""Add user_settings table
+
+Revision ID: 002_add_user_settings
+Revises: 001_baseline_schema
+Create Date: 2026-10-15 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '002_add_user_settings'
+down_revision: Union[str, None] = '001_baseline_schema'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema - Create user_settings table."""
+
+    # Databases set up while the app still called db.create_all() already have it
+    if sa.inspect(op.get_bind()).has_table('user_settings'):
+        return
+
+    op.create_table('user_settings',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('setting_key', sa.String(100), unique=True, nullable=False),
+        sa.Column('setting_value', sa.Text(), nullable=False),
+        sa.Column('created_at', sa.DateTime()),
+        sa.Column('updated_at', sa.DateTime()),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema - Drop user_settings table."""
+    op.drop_table('user_settings')
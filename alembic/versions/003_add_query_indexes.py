@@ -0,0 +1,43 @@
+"""Add indexes for due-problem, review history and session queries
+
+Revision ID: 003_add_query_indexes
+Revises: 002_add_user_settings
+Create Date: 2026-10-15 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '003_add_query_indexes'
+down_revision: Union[str, None] = '002_add_user_settings'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema - Add indexes for the hot read paths."""
+
+    # Due problems are selected and ordered by next_review
+    op.create_index('ix_stats_next_review', 'problem_stats', ['next_review'])
+
+    # Review history per problem, newest first
+    op.create_index('ix_reviews_problem_id', 'reviews', ['problem_id', 'reviewed_at'])
+
+    # Active/paused session lookups
+    op.create_index('ix_sessions_status', 'sessions', ['status'])
+
+    # Nearly every problem query filters on is_active = 1
+    op.create_index('ix_problems_active', 'problems', ['is_active'],
+                    sqlite_where=sa.text('is_active = 1'))
+
+
+def downgrade() -> None:
+    """Downgrade schema - Drop query indexes."""
+    op.drop_index('ix_problems_active', table_name='problems')
+    op.drop_index('ix_sessions_status', table_name='sessions')
+    op.drop_index('ix_reviews_problem_id', table_name='reviews')
+    op.drop_index('ix_stats_next_review', table_name='problem_stats')
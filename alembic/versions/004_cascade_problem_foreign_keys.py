@@ -0,0 +1,48 @@
+"""Cascade problem deletes to reviews and stats, index reviews.session_id
+
+Revision ID: 004_cascade_problem_foreign_keys
+Revises: 003_add_query_indexes
+Create Date: 2026-10-15 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '004_cascade_problem_foreign_keys'
+down_revision: Union[str, None] = '003_add_query_indexes'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# The baseline created its foreign keys unnamed - name them on reflection so
+# batch mode can drop and recreate them
+naming_convention = {
+    'fk': 'fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s',
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema - Recreate problem foreign keys with ON DELETE CASCADE."""
+
+    for table in ('reviews', 'problem_stats'):
+        fk_name = f'fk_{table}_problem_id_problems'
+        with op.batch_alter_table(table, naming_convention=naming_convention) as batch_op:
+            batch_op.drop_constraint(fk_name, type_='foreignkey')
+            batch_op.create_foreign_key(fk_name, 'problems', ['problem_id'], ['id'], ondelete='CASCADE')
+
+    # SQLite doesn't index foreign key columns on its own
+    op.create_index('ix_reviews_session_id', 'reviews', ['session_id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema - Restore plain problem foreign keys."""
+    op.drop_index('ix_reviews_session_id', table_name='reviews')
+
+    for table in ('reviews', 'problem_stats'):
+        fk_name = f'fk_{table}_problem_id_problems'
+        with op.batch_alter_table(table, naming_convention=naming_convention) as batch_op:
+            batch_op.drop_constraint(fk_name, type_='foreignkey')
+            batch_op.create_foreign_key(fk_name, 'problems', ['problem_id'], ['id'])
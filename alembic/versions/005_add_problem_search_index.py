@@ -0,0 +1,61 @@
+"""Add a trigram full-text index over problem titles and tags
+
+Revision ID: 005_add_problem_search_index
+Revises: 004_cascade_problem_foreign_keys
+Create Date: 2026-10-15 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '005_add_problem_search_index'
+down_revision: Union[str, None] = '004_cascade_problem_foreign_keys'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema - Add problems_fts and the triggers keeping it in sync."""
+
+    # External-content table: the text stays in problems, problems_fts only
+    # holds the index. The trigram tokenizer matches arbitrary substrings
+    # case-insensitively, like the ILIKE '%...%' search it replaces
+    op.execute("""
+        CREATE VIRTUAL TABLE problems_fts USING fts5(
+            title, tags, content='problems', content_rowid='id', tokenize='trigram'
+        )
+    """)
+
+    # Batch migrations that recreate problems drop these triggers -
+    # recreate them (and rebuild the index) afterwards
+    op.execute("""
+        CREATE TRIGGER problems_fts_insert AFTER INSERT ON problems BEGIN
+            INSERT INTO problems_fts(rowid, title, tags) VALUES (new.id, new.title, new.tags);
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER problems_fts_delete AFTER DELETE ON problems BEGIN
+            INSERT INTO problems_fts(problems_fts, rowid, title, tags) VALUES ('delete', old.id, old.title, old.tags);
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER problems_fts_update AFTER UPDATE OF title, tags ON problems BEGIN
+            INSERT INTO problems_fts(problems_fts, rowid, title, tags) VALUES ('delete', old.id, old.title, old.tags);
+            INSERT INTO problems_fts(rowid, title, tags) VALUES (new.id, new.title, new.tags);
+        END
+    """)
+
+    # Index the problems that already exist
+    op.execute("INSERT INTO problems_fts(problems_fts) VALUES ('rebuild')")
+
+
+def downgrade() -> None:
+    """Downgrade schema - Drop problems_fts and its triggers."""
+    op.execute("DROP TRIGGER IF EXISTS problems_fts_update")
+    op.execute("DROP TRIGGER IF EXISTS problems_fts_delete")
+    op.execute("DROP TRIGGER IF EXISTS problems_fts_insert")
+    op.execute("DROP TABLE IF EXISTS problems_fts")
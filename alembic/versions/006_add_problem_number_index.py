@@ -0,0 +1,32 @@
+"""Index problems.number for duplicate checks
+
+Revision ID: 006_add_problem_number_index
+Revises: 005_add_problem_search_index
+Create Date: 2026-10-15 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '006_add_problem_number_index'
+down_revision: Union[str, None] = '005_add_problem_search_index'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema - Add an index on problems (number, is_active)."""
+
+    # Duplicate checks look problems up by url OR number among active ones;
+    # url already has its unique index, so with this one SQLite can answer
+    # both sides of the OR from indexes instead of scanning the table
+    op.create_index('ix_problems_number_active', 'problems', ['number', 'is_active'])
+
+
+def downgrade() -> None:
+    """Downgrade schema - Drop the problems number index."""
+    op.drop_index('ix_problems_number_active', table_name='problems')
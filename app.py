@@ -1,22 +1,105 @@
 #!/usr/bin/env python3
 
 import os
+import fcntl
+import gzip
+import heapq
+import json
+import logging
+import re
 import shutil
-import glob
+import sqlite3
+import threading
+import time
+import orjson
 from flask import Flask
+from flask.json.provider import DefaultJSONProvider, JSONProvider
 from datetime import datetime
-from alembic.config import Config as AlembicConfig
-from alembic import command
+from jinja2 import FileSystemBytecodeCache
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, make_url
 
 from models import db
 from config import Config
 from utils import get_data_directory
-from idle_monitor import create_idle_monitor, get_idle_monitor, record_activity, GracefulShutdown
+from idle_monitor import create_idle_monitor, get_idle_monitor, record_activity, is_socket_activation_enabled, GracefulShutdown, COPY_BUFFER_SIZE
+
+
+if __name__ == '__main__':
+    # Only when run as the server - importing the module (tests, a WSGI host)
+    # leaves the root logger to the caller. Configured before create_app()
+    # below so its backup and migration messages are shown
+    logging.basicConfig(format='%(asctime)s %(levelname)s %(message)s')
+
+logger = logging.getLogger('spacedcode.startup')
+# Set on the logger rather than the root so other libraries stay quiet, and
+# so it survives Alembic's fileConfig resetting the root level
+logger.setLevel(logging.INFO)
+
+# Application paths, resolved once at import
+APP_BASE_PATH = os.path.dirname(os.path.abspath(__file__))
+ALEMBIC_INI_PATH = os.path.join(APP_BASE_PATH, 'alembic.ini')
+ALEMBIC_INI_EXISTS = os.path.exists(ALEMBIC_INI_PATH)
+ALEMBIC_SCRIPT_PATH = os.path.join(APP_BASE_PATH, 'alembic')
+ALEMBIC_VERSIONS_PATH = os.path.join(ALEMBIC_SCRIPT_PATH, 'versions')
+
+# Revision matching the schema of databases created before Alembic was used
+BASELINE_REVISION = '001_baseline_schema'
+
+# Applied to every new SQLite connection
+SQLITE_PRAGMAS = (
+    'journal_mode=WAL',
+    'synchronous=NORMAL',
+    'mmap_size=268435456',
+    'cache_size=-65536',
+    'temp_store=MEMORY',
+    'foreign_keys=ON',
+)
+
+# Rows sampled per index when gathering planner statistics
+ANALYSIS_LIMIT = 1000
+
+
+@event.listens_for(Engine, 'connect')
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    """Enable WAL, memory-mapped I/O and a larger page cache on SQLite connections"""
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+
+    cursor = dbapi_connection.cursor()
+    try:
+        for pragma in SQLITE_PRAGMAS:
+            cursor.execute(f'PRAGMA {pragma}')
+    finally:
+        cursor.close()
 
 
 def get_app_base_path():
     """Get the base path of the application (handles both dev and packaged)"""
-    return os.path.dirname(os.path.abspath(__file__))
+    return APP_BASE_PATH
+
+
+def get_database_fingerprint(db_path):
+    """Get (size, mtime) of the database and its WAL file to detect changes"""
+    fingerprint = []
+    for path in (db_path, db_path + '-wal'):
+        if os.path.exists(path):
+            stat = os.stat(path)
+            fingerprint.append([os.path.basename(path), stat.st_size, stat.st_mtime_ns])
+    return fingerprint
+
+
+def get_backup_time_ns(filename):
+    """Get the creation time encoded in a backup file name (nanoseconds since the epoch)"""
+    stamp = filename[len('leetcode_backup_'):].split('.', 1)[0]
+    if stamp.isdigit():
+        return int(stamp)
+
+    # Older backups are named with a local %Y%m%d_%H%M%S timestamp
+    try:
+        return int(datetime.strptime(stamp, '%Y%m%d_%H%M%S').timestamp()) * 1_000_000_000
+    except ValueError:
+        return 0
 
 
 def create_database_backup(data_dir):
@@ -28,75 +111,229 @@ def create_database_backup(data_dir):
     backup_dir = os.path.join(data_dir, 'backups')
     os.makedirs(backup_dir, exist_ok=True)
 
-    # Create backup with timestamp
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    backup_path = os.path.join(backup_dir, f'leetcode_backup_{timestamp}.db')
+    # Skip the backup if the database hasn't changed since the last one
+    stamp_path = os.path.join(backup_dir, 'last_backup.json')
+    fingerprint = get_database_fingerprint(db_path)
+    try:
+        with open(stamp_path) as f:
+            last_backup = json.load(f)
+        if (last_backup.get('fingerprint') == fingerprint and
+                os.path.exists(os.path.join(backup_dir, last_backup.get('backup', '')))):
+            logger.info(f"Database unchanged since last backup: {last_backup['backup']}")
+            return
+    except (OSError, ValueError):
+        pass
 
+    # Name the backup by time_ns so backups taken within the same second stay ordered
+    backup_path = os.path.join(backup_dir, f'leetcode_backup_{time.time_ns()}.db.gz')
+
+    snapshot_path = backup_path + '.snapshot'
     try:
-        shutil.copy2(db_path, backup_path)
-        print(f"Database backup created: {backup_path}")
+        # Use SQLite's online backup API so pages still sitting in the WAL
+        # are included and concurrent writers can't tear the copy. The
+        # snapshot goes to a file rather than memory, so a large database
+        # isn't held in RAM while it's compressed
+        src = sqlite3.connect(db_path)
+        try:
+            snapshot = sqlite3.connect(snapshot_path)
+            try:
+                # Copy in 1024-page steps so the read lock is released between
+                # steps and a request committing meanwhile isn't held up
+                src.backup(snapshot, pages=1024)
+            finally:
+                snapshot.close()
+        finally:
+            src.close()
+
+        # SQLite pages are mostly padding, so the backup compresses well
+        tmp_path = backup_path + '.tmp'
+        with open(snapshot_path, 'rb') as src_file, gzip.open(tmp_path, 'wb', compresslevel=6) as f:
+            shutil.copyfileobj(src_file, f, COPY_BUFFER_SIZE)
+        os.replace(tmp_path, backup_path)
+        logger.info(f"Database backup created: {backup_path}")
+
+        with open(stamp_path, 'w') as f:
+            json.dump({'backup': os.path.basename(backup_path), 'fingerprint': fingerprint}, f)
 
         # Keep only last 10 backups
-        backup_files = sorted(glob.glob(os.path.join(backup_dir, 'leetcode_backup_*.db')))
+        with os.scandir(backup_dir) as entries:
+            backup_files = [entry for entry in entries
+                            if entry.name.startswith('leetcode_backup_') and entry.name.endswith(('.db', '.db.gz'))]
         if len(backup_files) > 10:
-            for old_backup in backup_files[:-10]:
-                os.remove(old_backup)
-                print(f"Removed old backup: {old_backup}")
+            for old_backup in heapq.nsmallest(len(backup_files) - 10, backup_files, key=lambda e: get_backup_time_ns(e.name)):
+                os.remove(old_backup.path)
+                logger.info(f"Removed old backup: {old_backup.path}")
 
     except Exception as e:
-        print(f"Warning: Could not create database backup: {e}")
+        logger.warning(f"Could not create database backup: {e}")
+    finally:
+        if os.path.exists(snapshot_path):
+            os.remove(snapshot_path)
+
+
+def get_database_revision(db_path):
+    """Read the applied Alembic revision directly from SQLite (None if unstamped)"""
+    if not os.path.exists(db_path):
+        return None
+
+    conn = sqlite3.connect(db_path)
+    try:
+        row = conn.execute("SELECT version_num FROM alembic_version").fetchone()
+        return row[0] if row else None
+    except sqlite3.OperationalError:
+        # No alembic_version table yet
+        return None
+    finally:
+        conn.close()
+
+
+# Matches the revision identifiers at the top of a migration script
+_REVISION_RE = re.compile(r"^(revision|down_revision)\b[^=]*=\s*['\"]([^'\"]+)['\"]", re.MULTILINE)
+
+
+def get_head_revision(versions_dir):
+    """Find the head revision by scanning migration scripts, without importing Alembic
+
+    Returns None unless there is exactly one head.
+    """
+    revisions = set()
+    down_revisions = set()
+    for entry in os.scandir(versions_dir):
+        if not entry.name.endswith('.py'):
+            continue
+        with open(entry.path, encoding='utf-8') as f:
+            for name, value in _REVISION_RE.findall(f.read()):
+                (revisions if name == 'revision' else down_revisions).add(value)
+
+    heads = revisions - down_revisions
+    return heads.pop() if len(heads) == 1 else None
+
+
+def database_has_tables(db_path):
+    """Check whether the SQLite database contains any user tables"""
+    if not os.path.exists(db_path):
+        return False
+
+    conn = sqlite3.connect(db_path)
+    try:
+        row = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' LIMIT 1"
+        ).fetchone()
+        return row is not None
+    finally:
+        conn.close()
 
 
-def run_alembic_migrations(database_url):
-    """Run Alembic migrations with proper error handling"""
+def analyze_database(db_path):
+    """Refresh the query planner statistics, e.g. after migrations added indexes"""
+    conn = sqlite3.connect(db_path)
+    try:
+        # Sample each index instead of reading it in full to keep startup quick
+        conn.execute(f'PRAGMA analysis_limit={ANALYSIS_LIMIT}')
+        conn.execute('ANALYZE')
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def run_alembic_migrations(database_url, backup_thread=None):
+    """Run Alembic migrations with proper error handling
+
+    If a startup backup is still running in ``backup_thread``, wait for it
+    before changing the schema so the backup reflects the pre-migration state.
+    """
     try:
         # Set environment variable to indicate we're running from app
         os.environ['ALEMBIC_FROM_APP'] = 'true'
         os.environ['ALEMBIC_DATABASE_URL'] = database_url
 
-        # Find alembic.ini in the same directory as this script
-        script_dir = os.path.dirname(os.path.abspath(__file__))
-        alembic_cfg_path = os.path.join(script_dir, 'alembic.ini')
+        if not ALEMBIC_INI_EXISTS:
+            logger.warning("⚠ Alembic configuration not found - skipping migrations")
+            return
+
+        # Compare the stamped revision with the scripts' head without
+        # importing Alembic - on an up-to-date database that's all we need
+        db_path = make_url(database_url).database
+        current_revision = get_database_revision(db_path)
+        head_revision = get_head_revision(ALEMBIC_VERSIONS_PATH)
 
-        if not os.path.exists(alembic_cfg_path):
-            print("⚠ Alembic configuration not found - skipping migrations")
+        if current_revision is not None and current_revision == head_revision:
+            logger.info("✅ Database schema is up to date")
             return
 
-        # Create Alembic config
-        alembic_cfg = AlembicConfig(alembic_cfg_path)
+        # Several processes may start at once (e.g. WSGI workers) - one
+        # migrates while the others wait, then find the schema at head
+        with open(os.path.join(os.path.dirname(db_path), 'migrate.lock'), 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
 
-        # Set script_location to absolute path for packaged deployment
-        alembic_cfg.set_main_option('script_location', os.path.join(script_dir, 'alembic'))
+            current_revision = get_database_revision(db_path)
+            if current_revision is not None and current_revision == head_revision:
+                logger.info("✅ Database schema is up to date")
+                return
 
-        # Set the database URL directly to avoid env.py recursion
-        alembic_cfg.set_main_option('sqlalchemy.url', database_url)
+            from alembic.config import Config as AlembicConfig
+            from alembic import command
 
-        # Get current revision
-        try:
-            command.current(alembic_cfg)
-            print("✅ Database schema is up to date")
-        except Exception as e:
-            if "no such table: alembic_version" in str(e).lower():
-                print("🔄 Initializing database with Alembic...")
-                # Stamp the database with the latest revision without running migrations
-                command.stamp(alembic_cfg, 'head')
-                print("✅ Database initialized with current schema")
-            else:
-                print("🔄 Running Alembic migrations...")
-                command.upgrade(alembic_cfg, 'head')
-                print("✅ Alembic migrations completed")
+            # Create Alembic config
+            alembic_cfg = AlembicConfig(ALEMBIC_INI_PATH)
+
+            # Set script_location to absolute path for packaged deployment
+            alembic_cfg.set_main_option('script_location', ALEMBIC_SCRIPT_PATH)
+
+            # Set the database URL directly to avoid env.py recursion
+            alembic_cfg.set_main_option('sqlalchemy.url', database_url)
+
+            if current_revision is None and database_has_tables(db_path):
+                # Tables were created by db.create_all() before Alembic managed the
+                # schema - they match the baseline, so upgrade from there
+                logger.info("🔄 Initializing database with Alembic...")
+                command.stamp(alembic_cfg, BASELINE_REVISION)
+
+            if backup_thread is not None:
+                backup_thread.join()
+            logger.info("🔄 Running Alembic migrations...")
+            command.upgrade(alembic_cfg, 'head')
+            logger.info("✅ Alembic migrations completed")
+
+            analyze_database(db_path)
 
     except Exception as e:
-        print(f"⚠ Warning: Could not run Alembic migrations: {e}")
-        print("  The app will continue with the current database schema.")
+        logger.warning(f"⚠ Could not run Alembic migrations: {e} - "
+                       "the app will continue with the current database schema")
     finally:
         # Clean up environment variables
         os.environ.pop('ALEMBIC_FROM_APP', None)
         os.environ.pop('ALEMBIC_DATABASE_URL', None)
 
 
+class OrjsonProvider(JSONProvider):
+    """JSON provider backed by orjson's C encoder
+
+    Keeps jsonify's output shape: sorted keys and a trailing newline. Types
+    orjson can't encode fall back to Flask's default handling.
+    """
+    options = orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=DefaultJSONProvider.default, option=self.options).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        # Hand orjson's bytes straight to the response, skipping a decode/encode
+        data = orjson.dumps(obj, default=DefaultJSONProvider.default, option=self.options | orjson.OPT_APPEND_NEWLINE)
+        return self._app.response_class(data, mimetype='application/json')
+
+
 def create_idle_middleware(app):
     """Create middleware to track activity for idle monitoring."""
+    # Without socket activation the monitor never shuts down, so don't put
+    # an activity hook in front of every request
+    if not is_socket_activation_enabled():
+        return app
+
     @app.before_request
     def track_activity():
         # Record activity on every request
@@ -105,30 +342,78 @@ def create_idle_middleware(app):
     return app
 
 
+def create_jinja_bytecode_cache(cache_dir, template_folder):
+    """Create the template bytecode cache, emptied when the templates move
+
+    Entries are keyed on the template's path and recompiled when its source
+    changes, so edits overwrite them in place. A deploy to a new location
+    (e.g. a new Nix store path) would leave the old entries behind forever -
+    the directory is disposable, so clear it instead.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    cache = FileSystemBytecodeCache(cache_dir)
+
+    stamp_path = os.path.join(cache_dir, 'template_folder')
+    try:
+        with open(stamp_path) as f:
+            cached_folder = f.read()
+    except OSError:
+        cached_folder = None
+
+    if cached_folder != template_folder:
+        cache.clear()
+        with open(stamp_path, 'w') as f:
+            f.write(template_folder)
+
+    return cache
+
+
+def is_reloader_parent():
+    """Check whether this is the Werkzeug reloader's watcher process
+
+    With debug enabled, ``python app.py`` spawns a child that serves requests
+    (WERKZEUG_RUN_MAIN=true) while the parent only watches for file changes.
+    """
+    return (__name__ == '__main__' and Config.is_debug() and
+            os.environ.get('WERKZEUG_RUN_MAIN') != 'true')
+
+
 def create_app():
     base_path = get_app_base_path()
     app = Flask(__name__,
                 template_folder=os.path.join(base_path, 'templates'),
                 static_folder=os.path.join(base_path, 'static'))
 
+    app.json = OrjsonProvider(app)
+
     # Load configuration
     app.config['SECRET_KEY'] = Config.SECRET_KEY
     app.config['SQLALCHEMY_DATABASE_URI'] = Config.get_database_uri()
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = Config.SQLALCHEMY_TRACK_MODIFICATIONS
 
-    # Create database backup BEFORE Flask touches the database
-    data_dir = get_data_directory()
-    create_database_backup(data_dir)
+    # Keep compiled templates in the data directory so a freshly started
+    # process (e.g. after an idle shutdown) skips parsing them again. Read
+    # SPACEDCODE_DEBUG without Config.is_debug() so importing the module
+    # doesn't require it
+    if os.environ.get('SPACEDCODE_DEBUG', 'false').lower() != 'true':
+        app.jinja_env.bytecode_cache = create_jinja_bytecode_cache(
+            os.path.join(get_data_directory(), 'jinja_cache'), app.template_folder)
 
     # Initialize extensions
     db.init_app(app)
 
-    with app.app_context():
-        # Create tables
-        db.create_all()
+    # The reloader's watcher never touches the database - leave the backup
+    # and migrations to the child that serves requests
+    if not is_reloader_parent():
+        # Create database backup in the background so startup doesn't wait on
+        # the copy; migrations join the thread before touching the schema
+        data_dir = get_data_directory()
+        backup_thread = threading.Thread(target=create_database_backup, args=(data_dir,), daemon=True)
+        backup_thread.start()
 
-        # Run Alembic migrations with database URL
-        run_alembic_migrations(app.config['SQLALCHEMY_DATABASE_URI'])
+        with app.app_context():
+            # Alembic owns the schema - create or upgrade tables via migrations
+            run_alembic_migrations(app.config['SQLALCHEMY_DATABASE_URI'], backup_thread)
 
     # Register route modules
     from routes.session import register_session_routes
@@ -173,17 +458,17 @@ if __name__ == '__main__':
     if idle_monitor.socket_activation:
         idle_monitor.start_monitoring(graceful_shutdown.shutdown)
 
-    print("Starting LeetCode Spaced Repetition System...")
+    logger.info("Starting LeetCode Spaced Repetition System...")
     if allow_remote:
-        print(f"Server will be available at: http://localhost:{port} (and all network interfaces)")
+        logger.info(f"Server will be available at: http://localhost:{port} (and all network interfaces)")
     else:
-        print(f"Server will be available at: http://localhost:{port} (localhost only)")
-    print(f"Data directory: {data_dir}")
-    print(f"Visit http://localhost:{port}/bookmarklet to install the bookmarklet")
+        logger.info(f"Server will be available at: http://localhost:{port} (localhost only)")
+    logger.info(f"Data directory: {data_dir}")
+    logger.info(f"Visit http://localhost:{port}/bookmarklet to install the bookmarklet")
     if not allow_remote:
-        print("Note: Set SPACEDCODE_ALLOW_REMOTE=true to allow remote connections")
+        logger.info("Note: Set SPACEDCODE_ALLOW_REMOTE=true to allow remote connections")
     if not idle_monitor.socket_activation:
-        print("Press Ctrl+C to stop the server")
+        logger.info("Press Ctrl+C to stop the server")
 
     try:
         app.run(debug=debug, host=host, port=port)
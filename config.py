@@ -9,6 +9,10 @@ from utils import get_data_directory
 class ScheduleProfile:
     """Schedule profile configuration for spaced repetition"""
 
+    # Profiles are built once at import and never modified
+    __slots__ = ('name', 'description', 'base_intervals', 'max_interval_hours',
+                 'easiness_range', 'sessions_per_day', 'rating_descriptions')
+
     def __init__(self, name, description, base_intervals, max_interval_hours,
                  easiness_range, sessions_per_day, rating_descriptions=None):
         self.name = name
@@ -125,7 +129,13 @@ class Config:
     # Current schedule profile (required from environment)
     @classmethod
     def get_current_schedule_profile(cls):
-        # Get from environment variable (required)
+        return cls.SCHEDULE_PROFILES[cls.get_current_schedule_name()]
+
+    @classmethod
+    def get_current_schedule_name(cls):
+        """Get the name of the current schedule profile"""
+        # Get from environment variable (required) - the name is the
+        # SCHEDULE_PROFILES key, so no search over the profiles is needed
         env_profile = os.environ.get('SPACEDCODE_SCHEDULE')
         if not env_profile:
             raise RuntimeError("SPACEDCODE_SCHEDULE environment variable is required")
@@ -134,16 +144,7 @@ class Config:
             available = ', '.join(cls.SCHEDULE_PROFILES.keys())
             raise RuntimeError(f"Invalid schedule profile '{env_profile}'. Available: {available}")
 
-        return cls.SCHEDULE_PROFILES[env_profile]
-
-    @classmethod
-    def get_current_schedule_name(cls):
-        """Get the name of the current schedule profile"""
-        current = cls.get_current_schedule_profile()
-        for name, profile in cls.SCHEDULE_PROFILES.items():
-            if profile == current:
-                return name
-        return 'aggressive'
+        return env_profile
 
     # Environment-based settings (required)
     @staticmethod
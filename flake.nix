@@ -47,6 +47,7 @@
             flask-sqlalchemy
             sqlalchemy
             alembic
+            orjson
           ];
 
           nativeBuildInputs = [ pkgs.makeWrapper ];
@@ -104,6 +105,7 @@
           python312Packages.requests
           python312Packages.python-dateutil
           python312Packages.alembic
+          python312Packages.orjson
           sqlite
         ];
       in
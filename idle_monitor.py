@@ -3,6 +3,8 @@ Idle monitoring system for SpacedCode auto-shutdown functionality.
 """
 
 import os
+import shutil
+import sqlite3
 import time
 import threading
 import signal
@@ -11,27 +13,34 @@ from datetime import datetime, timedelta
 from typing import Optional
 
 
+def is_socket_activation_enabled() -> bool:
+    """Check whether the app runs under systemd socket activation (and may idle out)."""
+    return os.environ.get('SPACEDCODE_SOCKET_ACTIVATION', 'false').lower() == 'true'
+
+
 class IdleMonitor:
     """Monitor application idle time and trigger shutdown when idle timeout is reached."""
 
-    def __init__(self, timeout_minutes: int = 480, check_interval: int = 60):
+    def __init__(self, timeout_minutes: int = 480, check_interval: int = 3600):
         """
         Initialize idle monitor.
 
         Args:
             timeout_minutes: Minutes of inactivity before shutdown (default: 8 hours)
-            check_interval: How often to check idle time in seconds (default: 60s)
+            check_interval: Longest the monitor sleeps between idle status logs,
+                in seconds (default: 1 hour)
         """
         self.timeout_minutes = timeout_minutes
         self.check_interval = check_interval
-        self.last_activity = datetime.now()
+        # Monotonic clock, so wall-clock jumps can't trigger or delay shutdown
+        self.last_activity_mono = time.monotonic()
         self.shutdown_callback: Optional[callable] = None
         self.monitor_thread: Optional[threading.Thread] = None
         self.running = False
-        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
 
         # Only enable auto-shutdown if we're running with socket activation
-        self.socket_activation = os.environ.get('SPACEDCODE_SOCKET_ACTIVATION', 'false').lower() == 'true'
+        self.socket_activation = is_socket_activation_enabled()
 
         if self.socket_activation:
             print(f"🕐 Idle monitor enabled: auto-shutdown after {timeout_minutes} minutes of inactivity")
@@ -43,14 +52,13 @@ class IdleMonitor:
         if not self.socket_activation:
             return
 
-        with self._lock:
-            self.last_activity = datetime.now()
+        # A single attribute store is atomic, so the per-request path takes
+        # no lock; readers just see the previous or the new timestamp
+        self.last_activity_mono = time.monotonic()
 
     def get_idle_time_minutes(self) -> float:
         """Get current idle time in minutes."""
-        with self._lock:
-            idle_time = datetime.now() - self.last_activity
-            return idle_time.total_seconds() / 60
+        return (time.monotonic() - self.last_activity_mono) / 60
 
     def start_monitoring(self, shutdown_callback: callable):
         """Start the idle monitoring thread."""
@@ -59,6 +67,7 @@ class IdleMonitor:
 
         self.shutdown_callback = shutdown_callback
         self.running = True
+        self._stop_event.clear()
         self.monitor_thread = threading.Thread(target=self._monitor_loop, daemon=True)
         self.monitor_thread.start()
         print(f"🚀 Idle monitoring started (timeout: {self.timeout_minutes} minutes)")
@@ -66,11 +75,17 @@ class IdleMonitor:
     def stop_monitoring(self):
         """Stop the idle monitoring thread."""
         self.running = False
+        self._stop_event.set()
         if self.monitor_thread and self.monitor_thread.is_alive():
             self.monitor_thread.join(timeout=1)
 
     def _monitor_loop(self):
-        """Main monitoring loop (runs in separate thread)."""
+        """Main monitoring loop (runs in separate thread).
+
+        Sleeps until the idle deadline implied by the last activity, then
+        re-checks. Requests in between just move the deadline, so the
+        thread wakes about once per timeout period instead of polling.
+        """
         while self.running:
             try:
                 idle_minutes = self.get_idle_time_minutes()
@@ -80,17 +95,19 @@ class IdleMonitor:
                     if self.shutdown_callback:
                         self.shutdown_callback()
                     break
-                else:
-                    # Log periodic status (every hour)
-                    if int(idle_minutes) % 60 == 0 and idle_minutes > 0:
-                        remaining = self.timeout_minutes - idle_minutes
-                        print(f"⏱️  Idle for {idle_minutes:.0f} minutes. Auto-shutdown in {remaining:.0f} minutes.")
 
-                time.sleep(self.check_interval)
+                remaining = self.timeout_minutes - idle_minutes
+                if idle_minutes >= 60:
+                    print(f"⏱️  Idle for {idle_minutes:.0f} minutes. Auto-shutdown in {remaining:.0f} minutes.")
 
+                # Wake at the deadline, or earlier to log status or stop
+                timeout = min(remaining * 60, self.check_interval)
             except Exception as e:
                 print(f"⚠️  Error in idle monitoring: {e}")
-                time.sleep(self.check_interval)
+                timeout = self.check_interval
+
+            if self._stop_event.wait(timeout):
+                break
 
     def get_status(self) -> dict:
         """Get current idle monitor status."""
@@ -102,17 +119,68 @@ class IdleMonitor:
 
         idle_minutes = self.get_idle_time_minutes()
         remaining_minutes = max(0, self.timeout_minutes - idle_minutes)
+        last_activity = datetime.now() - timedelta(minutes=idle_minutes)
 
         return {
             'enabled': True,
             'timeout_minutes': self.timeout_minutes,
             'idle_minutes': round(idle_minutes, 1),
             'remaining_minutes': round(remaining_minutes, 1),
-            'last_activity': self.last_activity.isoformat(),
-            'will_shutdown_at': (self.last_activity + timedelta(minutes=self.timeout_minutes)).isoformat()
+            'last_activity': last_activity.isoformat(),
+            'will_shutdown_at': (last_activity + timedelta(minutes=self.timeout_minutes)).isoformat()
         }
 
 
+# Linux ioctl that makes the destination share the source file's extents
+FICLONE = 0x40049409
+
+# Buffer for the plain read/write fallback copy
+COPY_BUFFER_SIZE = 4 * 1024 * 1024
+
+
+def copy_database_file(src_path: str, dst_path: str):
+    """Copy a database file as a reflink clone where possible, and sync it to disk.
+
+    Falls back to an in-kernel copy_file_range, then to a buffered copy.
+    """
+    with open(src_path, 'rb') as src, open(dst_path, 'wb') as dst:
+        _copy_file_contents(src, dst)
+
+        # The process is about to be killed - make sure the copy is on disk
+        # rather than in the page cache. macOS has no fdatasync
+        getattr(os, 'fdatasync', os.fsync)(dst.fileno())
+
+
+def _copy_file_contents(src, dst):
+    """Copy src into dst (both open binary files) as cheaply as the platform allows."""
+    if sys.platform.startswith('linux'):
+        import fcntl
+        try:
+            # O(1) on copy-on-write filesystems (btrfs, XFS with reflink)
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+            return
+        except OSError:
+            # Filesystem can't clone, or src and dst are on different devices
+            pass
+
+    if hasattr(os, 'copy_file_range'):
+        try:
+            remaining = os.fstat(src.fileno()).st_size
+            while remaining > 0:
+                copied = os.copy_file_range(src.fileno(), dst.fileno(), remaining)
+                if not copied:
+                    break
+                remaining -= copied
+            return
+        except OSError:
+            # Not supported by this kernel/filesystem - use a regular copy
+            src.seek(0)
+            dst.seek(0)
+            dst.truncate()
+
+    shutil.copyfileobj(src, dst, COPY_BUFFER_SIZE)
+
+
 class GracefulShutdown:
     """Handle graceful shutdown of the Flask application."""
 
@@ -131,8 +199,6 @@ class GracefulShutdown:
         try:
             # Create final database backup before shutdown
             from utils import get_data_directory
-            import shutil
-            from datetime import datetime
 
             data_dir = get_data_directory()
             db_path = os.path.join(data_dir, 'leetcode.db')
@@ -144,7 +210,25 @@ class GracefulShutdown:
                 timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
                 backup_path = os.path.join(backup_dir, f'leetcode_shutdown_{timestamp}.db')
 
-                shutil.copy2(db_path, backup_path)
+                # Fold the WAL back into the main file so the raw copy is complete
+                conn = sqlite3.connect(db_path)
+                try:
+                    busy, _, _ = conn.execute('PRAGMA wal_checkpoint(TRUNCATE)').fetchone()
+                    if busy:
+                        # Another connection blocked the checkpoint, so the main
+                        # file alone would miss pages still in the WAL - take a
+                        # consistent copy through SQLite instead (synchronous=FULL
+                        # by default, so it is on disk once the backup returns)
+                        backup_conn = sqlite3.connect(backup_path)
+                        try:
+                            conn.backup(backup_conn)
+                        finally:
+                            backup_conn.close()
+                finally:
+                    conn.close()
+
+                if not busy:
+                    copy_database_file(db_path, backup_path)
                 print(f"💾 Final database backup created: {backup_path}")
 
         except Exception as e:
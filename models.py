@@ -4,8 +4,18 @@ import re
 
 db = SQLAlchemy()
 
+# Captures the slug segment of a LeetCode problem URL
+_SLUG_RE = re.compile(r'/problems/([^/]+)')
+
+# Scaled by interval_hours when scheduling the next review
+_ONE_HOUR = timedelta(hours=1)
+
 class Problem(db.Model):
     __tablename__ = 'problems'
+    __table_args__ = (
+        db.Index('ix_problems_active', 'is_active', sqlite_where=db.text('is_active = 1')),
+        db.Index('ix_problems_number_active', 'number', 'is_active'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     url = db.Column(db.String(500), unique=True, nullable=False)
@@ -23,19 +33,22 @@ class Problem(db.Model):
     reviews = db.relationship('Review', backref='problem', lazy=True, cascade='all, delete-orphan')
     stats = db.relationship('ProblemStats', backref='problem', uselist=False, cascade='all, delete-orphan')
 
-    def __init__(self, url, **kwargs):
+    def __init__(self, url, slug=None, **kwargs):
         self.url = url
-        self.slug = self.extract_slug_from_url(url)
+        # Callers with a slug at hand (the bookmarklet, an import of an
+        # export) pass it in, sparing the URL parse
+        self.slug = slug or self.extract_slug_from_url(url)
         for key, value in kwargs.items():
             setattr(self, key, value)
 
     @staticmethod
     def extract_slug_from_url(url):
         """Extract problem slug from LeetCode URL"""
-        match = re.search(r'/problems/([^/]+)', url)
+        match = _SLUG_RE.search(url)
         return match.group(1) if match else None
 
-    def to_dict(self):
+    def to_dict(self, now=None):
+        """Serialize the problem; pass ``now`` to share one clock reading across a listing"""
         return {
             'id': self.id,
             'url': self.url,
@@ -48,14 +61,18 @@ class Problem(db.Model):
             'notes': self.notes,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'is_active': self.is_active,
-            'stats': self.stats.to_dict() if self.stats else None
+            'stats': self.stats.to_dict(now) if self.stats else None
         }
 
 class Review(db.Model):
     __tablename__ = 'reviews'
+    __table_args__ = (
+        db.Index('ix_reviews_problem_id', 'problem_id', 'reviewed_at'),
+        db.Index('ix_reviews_session_id', 'session_id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
-    problem_id = db.Column(db.Integer, db.ForeignKey('problems.id'), nullable=False)
+    problem_id = db.Column(db.Integer, db.ForeignKey('problems.id', ondelete='CASCADE'), nullable=False)
     rating = db.Column(db.Integer, nullable=False)  # 0-5
     reviewed_at = db.Column(db.DateTime, default=datetime.utcnow)
     time_spent_seconds = db.Column(db.Integer)
@@ -73,6 +90,9 @@ class Review(db.Model):
 
 class Session(db.Model):
     __tablename__ = 'sessions'
+    __table_args__ = (
+        db.Index('ix_sessions_status', 'status'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     started_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -126,6 +146,11 @@ class Session(db.Model):
         max_duration_minutes = getattr(self, 'max_duration_minutes', None)
         total_time_seconds = getattr(self, 'total_time_seconds', None)
 
+        return self.is_time_limit_reached(total_time_seconds, max_duration_minutes)
+
+    @staticmethod
+    def is_time_limit_reached(total_time_seconds, max_duration_minutes):
+        """Check a session's time limit from raw column values (e.g. an UPDATE's RETURNING row)"""
         if not max_duration_minutes:
             return False
 
@@ -156,8 +181,11 @@ class Session(db.Model):
 
 class ProblemStats(db.Model):
     __tablename__ = 'problem_stats'
+    __table_args__ = (
+        db.Index('ix_stats_next_review', 'next_review'),
+    )
 
-    problem_id = db.Column(db.Integer, db.ForeignKey('problems.id'), primary_key=True)
+    problem_id = db.Column(db.Integer, db.ForeignKey('problems.id', ondelete='CASCADE'), primary_key=True)
     easiness_factor = db.Column(db.Float, default=2.5)
     interval_hours = db.Column(db.Float, default=1.0)
     repetitions = db.Column(db.Integer, default=0)
@@ -167,7 +195,16 @@ class ProblemStats(db.Model):
     average_rating = db.Column(db.Float)
     last_reviewed = db.Column(db.DateTime)
 
-    def to_dict(self):
+    def __init__(self, **kwargs):
+        # Column defaults are only filled in on INSERT, but a new row goes
+        # through update_stats() before it is flushed - start from them
+        kwargs.setdefault('easiness_factor', 2.5)
+        kwargs.setdefault('interval_hours', 1.0)
+        kwargs.setdefault('repetitions', 0)
+        kwargs.setdefault('total_reviews', 0)
+        super().__init__(**kwargs)
+
+    def to_dict(self, now=None):
         return {
             'problem_id': self.problem_id,
             'easiness_factor': self.easiness_factor,
@@ -178,19 +215,20 @@ class ProblemStats(db.Model):
             'total_reviews': self.total_reviews,
             'average_rating': self.average_rating,
             'last_reviewed': self.last_reviewed.isoformat() if self.last_reviewed else None,
-            'is_due': self.is_due()
+            'is_due': self.is_due(now)
         }
 
-    def is_due(self):
-        """Check if problem is due for review"""
-        return self.next_review <= datetime.utcnow()
+    def is_due(self, now=None):
+        """Check if problem is due for review (as of ``now``, default the current time)"""
+        return self.next_review <= (now or datetime.utcnow())
 
     def update_stats(self, rating):
         """Update stats after a review using new weighted system"""
         from scheduler import calculate_next_review, calculate_effective_rating
 
+        now = datetime.utcnow()
         self.last_rating = rating
-        self.last_reviewed = datetime.utcnow()
+        self.last_reviewed = now
         self.total_reviews = (self.total_reviews or 0) + 1
 
         # Update average rating using exponential moving average for smoother transitions
@@ -207,7 +245,7 @@ class ProblemStats(db.Model):
             self.problem_id, self  # Pass full stats object for history access
         )
 
-        self.next_review = datetime.utcnow() + timedelta(hours=self.interval_hours)
+        self.next_review = now + _ONE_HOUR * self.interval_hours
 
         # Update repetitions based on effective performance
         effective_rating = calculate_effective_rating(rating, self.problem_id, self)
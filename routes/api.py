@@ -2,16 +2,35 @@
 API routes for LeetCode SRS.
 """
 
-from flask import request, jsonify
+from flask import request, jsonify, Response, stream_with_context, current_app
 from datetime import datetime
 import json
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import contains_eager, defer
 
 from models import db, Problem, Review, Session, ProblemStats
-from scheduler import get_session_problems, get_study_stats
+from scheduler import get_session_problems
 from utils import normalize_leetcode_url, extract_problem_number_from_url, check_duplicate_problem
 from idle_monitor import get_idle_monitor
 
 
+# Rows fetched per round-trip while streaming an export
+EXPORT_BATCH_SIZE = 200
+
+
+def dump_json(obj):
+    """Serialize with the app's JSON provider (orjson: compact, sorted keys)"""
+    return current_app.json.dumps(obj)
+
+
+def stream_json_array(items):
+    """Yield a JSON array piece by piece from an iterable of serializable items"""
+    yield '['
+    for index, item in enumerate(items):
+        yield (',' if index else '') + dump_json(item)
+    yield ']'
+
+
 def register_api_routes(app):
     """Register API routes with the Flask app"""
 
@@ -19,18 +38,27 @@ def register_api_routes(app):
     def api_due_problems():
         """API endpoint to get due problems"""
         try:
-            problems_with_stats = db.session.query(Problem, ProblemStats).outerjoin(ProblemStats).filter(Problem.is_active == True).all()
-            due_problems = []
+            # Let SQLite pick due problems via ix_stats_next_review instead of
+            # loading every problem and checking is_due() in Python
+            query = Problem.query.join(Problem.stats).options(contains_eager(Problem.stats)).filter(
+                Problem.is_active == True,
+                ProblemStats.next_review <= datetime.utcnow()
+            ).order_by(ProblemStats.next_review)
 
-            for problem, stats in problems_with_stats:
-                if stats and stats.is_due():
-                    due_problems.append({
-                        'id': problem.id,
-                        'title': problem.title,
-                        'url': problem.url,
-                        'difficulty': problem.difficulty,
-                        'next_review': stats.next_review.isoformat() if stats.next_review else None
-                    })
+            limit = request.args.get('limit', type=int)
+            if limit:
+                query = query.limit(limit)
+
+            due_problems = []
+            for problem in query:
+                stats = problem.stats
+                due_problems.append({
+                    'id': problem.id,
+                    'title': problem.title,
+                    'url': problem.url,
+                    'difficulty': problem.difficulty,
+                    'next_review': stats.next_review.isoformat() if stats.next_review else None
+                })
 
             return jsonify(due_problems)
         except Exception as e:
@@ -50,6 +78,7 @@ def register_api_routes(app):
             tags = data.get('tags', [])
             description = data.get('description', '').strip()
             number = data.get('number')
+            slug = data.get('slug')
 
             if not url:
                 return jsonify({'error': 'URL is required'}), 400
@@ -112,6 +141,7 @@ def register_api_routes(app):
                 # Create new problem
                 new_problem = Problem(
                     url=normalized_url,
+                    slug=slug,
                     title=title,
                     difficulty=difficulty,
                     tags=','.join(tags) if isinstance(tags, list) else tags,
@@ -136,38 +166,49 @@ def register_api_routes(app):
 
     @app.route('/api/export-data')
     def api_export_data():
-        """Export all data as JSON"""
-        try:
-            # Get all problems with their stats
-            problems_with_stats = db.session.query(Problem, ProblemStats).outerjoin(ProblemStats).filter(Problem.is_active == True).all()
-            problems_data = []
-
-            for problem, stats in problems_with_stats:
-                problem_data = problem.to_dict()
-                if stats:
-                    problem_data['stats'] = stats.to_dict()
-                problems_data.append(problem_data)
+        """Export all data as JSON, streamed one record at a time"""
+        def generate():
+            # Queries run inside the generator so they use the session of the
+            # context stream_with_context keeps alive while streaming
+
+            # Get all problems with their stats - load the stats relationship from
+            # the join so to_dict() doesn't lazy-load it once per problem.
+            # 2.0-style selects, since legacy Query uniques its results and
+            # won't combine that with yield_per
+            problems = db.session.scalars(
+                db.select(Problem)
+                .outerjoin(Problem.stats)
+                .options(contains_eager(Problem.stats))
+                .filter(Problem.is_active == True)
+                .execution_options(yield_per=EXPORT_BATCH_SIZE)
+            )
+
+            # Same compact, key-sorted layout jsonify produces, but written
+            # as rows are fetched instead of building the whole export first
+            now = datetime.utcnow()
+            yield f'{{"export_date":{dump_json(now.isoformat())},"problems":'
+            yield from stream_json_array(problem.to_dict(now) for problem in problems)
 
             # Get all reviews
-            reviews = Review.query.all()
-            reviews_data = [review.to_dict() for review in reviews]
+            reviews = db.session.scalars(
+                db.select(Review).execution_options(yield_per=EXPORT_BATCH_SIZE)
+            )
+            yield ',"reviews":'
+            yield from stream_json_array(review.to_dict() for review in reviews)
 
             # Get all sessions
-            sessions = Session.query.filter(Session.completed_at.isnot(None)).order_by(Session.completed_at.desc()).all()
-            sessions_data = [session.to_dict() for session in sessions]
+            sessions = db.session.scalars(
+                db.select(Session)
+                .filter(Session.completed_at.isnot(None))
+                .order_by(Session.completed_at.desc())
+                .execution_options(yield_per=EXPORT_BATCH_SIZE)
+            )
+            yield ',"sessions":'
+            yield from stream_json_array(session.to_dict() for session in sessions)
 
-            export_data = {
-                'export_date': datetime.utcnow().isoformat(),
-                'version': '1.0',
-                'problems': problems_data,
-                'reviews': reviews_data,
-                'sessions': sessions_data
-            }
+            yield ',"version":"1.0"}\n'
 
-            return jsonify(export_data)
-
-        except Exception as e:
-            return jsonify({'error': str(e)}), 500
+        return Response(stream_with_context(generate()), mimetype='application/json')
 
     @app.route('/api/bulk-import', methods=['POST'])
     def api_bulk_import():
@@ -182,6 +223,9 @@ def register_api_routes(app):
             updated_count = 0
             errors = []
 
+            # Parse and normalize every row up front so existing problems can
+            # be fetched in one query instead of one lookup per row
+            rows = []
             for problem_data in problems_data:
                 try:
                     url = problem_data.get('url', '').strip()
@@ -202,8 +246,32 @@ def register_api_routes(app):
                     if not number:
                         number = extract_problem_number_from_url(normalized_url)
 
-                    # Check for existing problem
-                    existing_problem = check_duplicate_problem(normalized_url, number)
+                    rows.append((problem_data, normalized_url, title, difficulty, tags, description, number))
+
+                except Exception as e:
+                    errors.append(f"Error processing problem {problem_data.get('title', 'Unknown')}: {str(e)}")
+
+            urls = {row[1] for row in rows}
+            numbers = {row[6] for row in rows if row[6]}
+            existing_by_url = {}
+            existing_by_number = {}
+            # Imported rows usually carry their own description, so don't
+            # load the stored one unless a row leaves it empty
+            for problem in Problem.query.options(defer(Problem.description)).filter(
+                    Problem.is_active == True,
+                    db.or_(Problem.url.in_(urls), Problem.number.in_(numbers))
+            ).order_by(Problem.id):
+                existing_by_url[problem.url] = problem
+                if problem.number:
+                    existing_by_number.setdefault(problem.number, problem)
+
+            # New problems are collected as plain rows; repeats within the
+            # import update the pending row just like an existing problem
+            new_by_url = {}
+            new_by_number = {}
+            for problem_data, normalized_url, title, difficulty, tags, description, number in rows:
+                try:
+                    existing_problem = existing_by_url.get(normalized_url) or existing_by_number.get(number)
 
                     if existing_problem:
                         # Update existing problem
@@ -213,24 +281,59 @@ def register_api_routes(app):
                         existing_problem.description = description or existing_problem.description
                         existing_problem.number = number or existing_problem.number
                         updated_count += 1
-                    else:
-                        # Create new problem
-                        new_problem = Problem(
-                            url=normalized_url,
-                            title=title,
-                            difficulty=difficulty,
-                            tags=','.join(tags) if isinstance(tags, list) else tags,
-                            description=description,
-                            number=number
-                        )
-                        db.session.add(new_problem)
-                        added_count += 1
+                        continue
+
+                    pending = new_by_url.get(normalized_url) or new_by_number.get(number)
+                    if pending:
+                        pending['title'] = title or pending['title']
+                        pending['difficulty'] = difficulty or pending['difficulty']
+                        pending['tags'] = ','.join(tags) if isinstance(tags, list) else (tags or pending['tags'])
+                        pending['description'] = description or pending['description']
+                        pending['number'] = number or pending['number']
+                        updated_count += 1
+                        continue
+
+                    # Create new problem
+                    new_problem = {
+                        'url': normalized_url,
+                        'slug': problem_data.get('slug') or Problem.extract_slug_from_url(normalized_url),
+                        'title': title,
+                        'difficulty': difficulty,
+                        'tags': ','.join(tags) if isinstance(tags, list) else tags,
+                        'description': description,
+                        'number': number
+                    }
+                    new_by_url[normalized_url] = new_problem
+                    if number:
+                        new_by_number.setdefault(number, new_problem)
+                    added_count += 1
 
                 except Exception as e:
                     errors.append(f"Error processing problem {problem_data.get('title', 'Unknown')}: {str(e)}")
 
+            # A single executemany - SQLAlchemy batches it into multi-row INSERTs.
+            # A soft-deleted problem still owns its URL, so let the unique index
+            # skip those rows instead of failing the whole import
+            new_problems = list(new_by_url.values())
+            if new_problems:
+                inserted_urls = set(db.session.scalars(
+                    insert(Problem).on_conflict_do_nothing(index_elements=['url']).returning(Problem.url),
+                    new_problems
+                ))
+                for new_problem in new_problems:
+                    if new_problem['url'] not in inserted_urls:
+                        added_count -= 1
+                        errors.append(f"Problem was deleted earlier, restore it instead: {new_problem['title'] or new_problem['url']}")
+
             db.session.commit()
 
+            if added_count:
+                # A large import can leave SQLite's planner statistics stale;
+                # this connection has just used the problems table, so let
+                # SQLite decide whether it needs re-analyzing
+                db.session.execute(db.text('PRAGMA optimize'))
+                db.session.commit()
+
             return jsonify({
                 'success': True,
                 'added_count': added_count,
@@ -4,6 +4,7 @@ Problem management routes for LeetCode SRS.
 
 from flask import render_template, request, redirect, url_for, flash, jsonify
 from datetime import datetime
+from sqlalchemy.orm import contains_eager
 
 from models import db, Problem, Review, Session, ProblemStats
 from utils import normalize_leetcode_url, extract_problem_number_from_url, check_duplicate_problem
@@ -20,14 +21,26 @@ def register_problem_routes(app):
         sort_by = request.args.get('sort', 'created_at')
         sort_order = request.args.get('order', 'desc')
 
-        # Base query for active problems with stats
-        query = db.session.query(Problem, ProblemStats).outerjoin(ProblemStats).filter(Problem.is_active == True)
+        # Base query for active problems, with problem.stats filled from the
+        # join that sorting by next_review needs
+        query = Problem.query.outerjoin(Problem.stats).options(contains_eager(Problem.stats)).filter(Problem.is_active == True)
 
         # Apply search filter
         if search_query:
+            if len(search_query) >= 3:
+                # Substring match through the trigram index in problems_fts,
+                # searched as one quoted phrase so FTS5 syntax is taken literally
+                phrase = '"' + search_query.replace('"', '""') + '"'
+                text_match = Problem.id.in_(
+                    db.select(db.literal_column('rowid'))
+                    .select_from(db.table('problems_fts'))
+                    .where(db.text('problems_fts MATCH :phrase').bindparams(phrase=phrase))
+                )
+            else:
+                # Trigrams need at least three characters
+                text_match = (Problem.title.ilike(f'%{search_query}%')) | (Problem.tags.ilike(f'%{search_query}%'))
             query = query.filter(
-                (Problem.title.ilike(f'%{search_query}%')) |
-                (Problem.tags.ilike(f'%{search_query}%')) |
+                text_match |
                 (Problem.number == search_query if search_query.isdigit() else False)
             )
 
@@ -52,10 +65,11 @@ def register_problem_routes(app):
         else:
             query = query.order_by(order_column.desc())
 
-        problems_with_stats = query.all()
+        problems = query.all()
 
         return render_template('problems.html',
-                             problems_with_stats=problems_with_stats,
+                             problems=problems,
+                             now=datetime.utcnow(),
                              search_query=search_query,
                              difficulty_filter=difficulty_filter,
                              sort_by=sort_by,
@@ -108,8 +122,11 @@ def register_problem_routes(app):
     def delete_problem(problem_id):
         """Soft delete a problem"""
         try:
-            problem = Problem.query.get_or_404(problem_id)
-            problem.is_active = False
+            # Flip the flag with a single UPDATE instead of loading the problem first
+            updated = Problem.query.filter_by(id=problem_id).update(
+                {'is_active': False}, synchronize_session=False)
+            if not updated:
+                return jsonify({'error': 'Problem not found'}), 404
             db.session.commit()
             return jsonify({'success': True, 'message': 'Problem deleted successfully'})
         except Exception as e:
@@ -120,10 +137,13 @@ def register_problem_routes(app):
     def restore_problem(problem_id):
         """Restore a soft-deleted problem"""
         try:
-            problem = Problem.query.get_or_404(problem_id)
-            problem.is_active = True
-            db.session.commit()
-            flash('Problem restored successfully!', 'success')
+            updated = Problem.query.filter_by(id=problem_id).update(
+                {'is_active': True}, synchronize_session=False)
+            if updated:
+                db.session.commit()
+                flash('Problem restored successfully!', 'success')
+            else:
+                flash('Problem not found', 'error')
         except Exception as e:
             db.session.rollback()
             flash(f'Error restoring problem: {str(e)}', 'error')
@@ -138,9 +158,8 @@ def register_problem_routes(app):
     @app.route('/stats')
     def stats():
         """Statistics page"""
-        from scheduler import get_study_stats
-        problems_with_stats = db.session.query(Problem, ProblemStats).outerjoin(ProblemStats).filter(Problem.is_active == True).all()
-        stats = get_study_stats(problems_with_stats)
+        from scheduler import get_cached_study_stats
+        stats = get_cached_study_stats()
 
         # Get session statistics
         completed_sessions = Session.query.filter_by(status='completed').order_by(Session.completed_at.desc()).all()
@@ -3,10 +3,49 @@ Session management routes for LeetCode SRS.
 """
 
 from flask import render_template, request, redirect, url_for, flash, session, jsonify
-from datetime import datetime
+from sqlalchemy.orm import joinedload
 
 from models import db, Problem, Review, Session, ProblemStats
-from scheduler import get_session_problems, get_study_stats, calculate_next_review
+from scheduler import get_session_problems, get_cached_study_stats, calculate_next_review, query_session_candidates
+
+
+# Session states a practice session can still be finished or paused from
+OPEN_SESSION_STATUSES = ('active', 'paused')
+
+# The current UTC time, stamped by SQLite inside the UPDATE. Formatted the way
+# SQLAlchemy stores Python datetimes (SQLite's clock stops at milliseconds, so
+# the microsecond field is padded) so these values compare and sort correctly
+# against the datetime.utcnow() ones in the other timestamp columns
+SQL_UTCNOW = db.func.strftime('%Y-%m-%d %H:%M:%f000', 'now', type_=db.DateTime)
+
+
+def transition_session(session_id, from_statuses, **values):
+    """
+    Update a session with one conditional UPDATE, only if it is currently in
+    one of from_statuses. Returns whether the session was updated.
+    """
+    result = db.session.execute(
+        db.update(Session)
+        .where(Session.id == session_id, Session.status.in_(from_statuses))
+        .values(**values)
+    )
+    return result.rowcount > 0
+
+
+def get_session_status(session_id):
+    """Get a session's status without loading it (None if there is no such session)"""
+    return db.session.scalar(db.select(Session.status).where(Session.id == session_id))
+
+
+def transition_error(session_id, action):
+    """
+    JSON error response for a transition_session() that changed nothing:
+    404 if the session doesn't exist, 409 if it isn't in a state to `action`.
+    """
+    status = get_session_status(session_id)
+    if status is None:
+        return jsonify({'error': 'Session not found'}), 404
+    return jsonify({'error': f'Cannot {action} a session that is {status}'}), 409
 
 
 def register_session_routes(app):
@@ -15,8 +54,7 @@ def register_session_routes(app):
     @app.route('/')
     def dashboard():
         """Main dashboard showing study stats and due problems"""
-        problems_with_stats = db.session.query(Problem, ProblemStats).outerjoin(ProblemStats).filter(Problem.is_active == True).all()
-        stats = get_study_stats(problems_with_stats)
+        stats = get_cached_study_stats()
 
         # Get recent sessions
         recent_sessions = Session.query.filter(Session.status == 'completed').order_by(Session.completed_at.desc()).limit(5).all()
@@ -34,8 +72,7 @@ def register_session_routes(app):
     @app.route('/session')
     def session_config():
         """Session configuration page"""
-        problems_with_stats = db.session.query(Problem, ProblemStats).outerjoin(ProblemStats).filter(Problem.is_active == True).all()
-        stats = get_study_stats(problems_with_stats)
+        stats = get_cached_study_stats()
 
         # Check for incomplete sessions
         incomplete_session = None
@@ -92,7 +129,7 @@ def register_session_routes(app):
         # Check if time expired
         if current_session.is_time_expired():
             current_session.status = 'completed'
-            current_session.completed_at = datetime.utcnow()
+            current_session.completed_at = SQL_UTCNOW
             db.session.commit()
             session.pop('current_session_id', None)
             flash('Your session time has expired! Great work!', 'success')
@@ -105,8 +142,8 @@ def register_session_routes(app):
             db.session.commit()
 
         # Get next problem for this session
-        problems_with_stats = db.session.query(Problem, ProblemStats).outerjoin(ProblemStats).filter(Problem.is_active == True).all()
-        session_problems = get_session_problems(problems_with_stats, session_size=1)
+        candidates = query_session_candidates()
+        session_problems = get_session_problems(candidates, session_size=1)
 
         if not session_problems:
             flash('No problems available for practice!', 'warning')
@@ -158,27 +195,30 @@ def register_session_routes(app):
                 app.logger.error(f"Session review failed - Invalid rating: {rating}")
                 return jsonify({'error': 'Rating must be between 0 and 5', 'debug': f'Rating received: {rating}'}), 400
 
-            # Get current session
-            current_session = None
+            # Update the current session's counters - a single UPDATE that
+            # only matches an active session, instead of loading it first
             session_id_from_session = session.get('current_session_id')
             app.logger.info(f"Session review request - Session ID from Flask session: {session_id_from_session}")
 
-            if 'current_session_id' in session:
-                current_session = Session.query.filter(
-                    Session.id == session['current_session_id'],
-                    Session.status == 'active'
+            current_session = None
+            if session_id_from_session is not None:
+                current_session = db.session.execute(
+                    db.update(Session)
+                    .where(Session.id == session_id_from_session, Session.status == 'active')
+                    .values(problems_reviewed=Session.problems_reviewed + 1,
+                            total_time_seconds=Session.total_time_seconds + time_spent)
+                    .returning(Session.id, Session.total_time_seconds, Session.max_duration_minutes)
                 ).first()
                 app.logger.info(f"Session review request - Found session: {current_session}")
-                if current_session:
-                    app.logger.info(f"Session review request - Session details: ID={current_session.id}, status={current_session.status}")
 
             if not current_session:
                 app.logger.error("Session review failed - No active session found")
                 return jsonify({'error': 'No active session found', 'debug': f'Session ID: {session_id_from_session}'}), 400
 
-            # Find the problem
-            problem = Problem.query.get(problem_id)
+            # Find the problem, with the stats the rating updates in the same query
+            problem = db.session.get(Problem, problem_id, options=[joinedload(Problem.stats)])
             if not problem:
+                db.session.rollback()
                 return jsonify({'error': 'Problem not found'}), 404
 
             # Create review record
@@ -190,23 +230,30 @@ def register_session_routes(app):
             )
             db.session.add(review)
 
-            # Update session stats
-            current_session.problems_reviewed += 1
-            current_session.total_time_seconds += time_spent
-
-            # Update problem stats
-            stats = ProblemStats.query.filter_by(problem_id=problem_id).first()
+            # Update problem stats - created on the first review, and saved
+            # together with the problem through the relationship cascade
+            stats = problem.stats
             if not stats:
-                stats = ProblemStats(problem_id=problem_id)
-                db.session.add(stats)
+                stats = problem.stats = ProblemStats(problem_id=problem_id)
 
             stats.update_stats(rating)
 
-            # Check if session time has expired after this rating
-            session_expired = current_session.is_time_expired()
+            # Check if session time has expired after this rating, and if so
+            # complete the session in the same commit as the review
+            session_expired = Session.is_time_limit_reached(
+                current_session.total_time_seconds, current_session.max_duration_minutes)
+            if session_expired:
+                db.session.execute(
+                    db.update(Session)
+                    .where(Session.id == current_session.id)
+                    .values(status='completed', completed_at=SQL_UTCNOW)
+                )
 
             db.session.commit()
 
+            if session_expired:
+                session.pop('current_session_id', None)
+
             # Return response with expiry status
             response_data = {
                 'success': True,
@@ -215,6 +262,7 @@ def register_session_routes(app):
 
             if session_expired:
                 response_data['session_expired'] = True
+                response_data['session_completed'] = True
                 response_data['message'] = f'Problem rated {rating}/5 - session completed due to time limit'
             else:
                 response_data['next_url'] = url_for('get_next_session_problem')
@@ -284,11 +332,8 @@ def register_session_routes(app):
                 Review.session_id == current_session.id
             )
 
-            problems_with_stats = db.session.query(Problem, ProblemStats).outerjoin(ProblemStats).filter(
-                Problem.is_active == True,
-                ~Problem.id.in_(reviewed_problem_ids)
-            ).all()
-            session_problems = get_session_problems(problems_with_stats, session_size=1)
+            candidates = query_session_candidates(exclude_problem_ids=reviewed_problem_ids)
+            session_problems = get_session_problems(candidates, session_size=1)
 
             db.session.commit()
 
@@ -316,10 +361,8 @@ def register_session_routes(app):
         """Complete the current session"""
         try:
             if 'current_session_id' in session:
-                current_session = Session.query.get(session['current_session_id'])
-                if current_session:
-                    current_session.status = 'completed'
-                    current_session.completed_at = datetime.utcnow()
+                if transition_session(session['current_session_id'], OPEN_SESSION_STATUSES,
+                                      status='completed', completed_at=SQL_UTCNOW):
                     db.session.commit()
                     session.pop('current_session_id', None)
                     return jsonify({
@@ -327,7 +370,7 @@ def register_session_routes(app):
                         'message': 'Session completed successfully'
                     })
                 else:
-                    return jsonify({'error': 'Session not found'}), 404
+                    return transition_error(session['current_session_id'], 'complete')
             else:
                 return jsonify({'error': 'No active session'}), 400
         except Exception as e:
@@ -339,17 +382,15 @@ def register_session_routes(app):
         """Pause the current session"""
         try:
             if 'current_session_id' in session:
-                current_session = Session.query.get(session['current_session_id'])
-                if current_session:
-                    current_session.status = 'paused'
-                    current_session.paused_at = datetime.utcnow()
+                if transition_session(session['current_session_id'], ('active',),
+                                      status='paused', paused_at=SQL_UTCNOW):
                     db.session.commit()
                     return jsonify({
                         'success': True,
                         'message': 'Session paused successfully'
                     })
                 else:
-                    return jsonify({'error': 'Session not found'}), 404
+                    return transition_error(session['current_session_id'], 'pause')
             else:
                 return jsonify({'error': 'No active session'}), 400
         except Exception as e:
@@ -360,12 +401,16 @@ def register_session_routes(app):
     def resume_session():
         """Resume the current session"""
         if 'current_session_id' in session:
-            current_session = Session.query.get(session['current_session_id'])
-            if current_session and current_session.status == 'paused':
-                current_session.status = 'active'
-                current_session.paused_at = None
+            session_id = session['current_session_id']
+            if transition_session(session_id, ('paused',), status='active', paused_at=None):
                 db.session.commit()
                 return redirect(url_for('practice_session'))
+
+            status = get_session_status(session_id)
+            if status == 'active':
+                # Already running, e.g. resumed from another tab
+                return redirect(url_for('practice_session'))
+            flash('Session not found' if status is None else f'Cannot resume a session that is {status}', 'error')
         return redirect(url_for('dashboard'))
 
     @app.route('/session/abandon', methods=['POST'])
@@ -373,10 +418,8 @@ def register_session_routes(app):
         """Abandon the current session"""
         try:
             if 'current_session_id' in session:
-                current_session = Session.query.get(session['current_session_id'])
-                if current_session:
-                    current_session.status = 'abandoned'
-                    current_session.completed_at = datetime.utcnow()
+                if transition_session(session['current_session_id'], OPEN_SESSION_STATUSES,
+                                      status='abandoned', completed_at=SQL_UTCNOW):
                     db.session.commit()
                     session.pop('current_session_id', None)
                     return jsonify({
@@ -384,7 +427,7 @@ def register_session_routes(app):
                         'message': 'Session ended successfully'
                     })
                 else:
-                    return jsonify({'error': 'Session not found'}), 404
+                    return transition_error(session['current_session_id'], 'abandon')
             else:
                 return jsonify({'error': 'No active session'}), 400
         except Exception as e:
@@ -409,7 +452,7 @@ def register_session_routes(app):
             # Check if time expired
             if current_session.is_time_expired():
                 current_session.status = 'completed'
-                current_session.completed_at = datetime.utcnow()
+                current_session.completed_at = SQL_UTCNOW
                 db.session.commit()
                 session.pop('current_session_id', None)
                 return jsonify({
@@ -418,8 +461,8 @@ def register_session_routes(app):
                 })
 
             # Get next problem
-            problems_with_stats = db.session.query(Problem, ProblemStats).outerjoin(ProblemStats).filter(Problem.is_active == True).all()
-            session_problems = get_session_problems(problems_with_stats, session_size=1)
+            candidates = query_session_candidates()
+            session_problems = get_session_problems(candidates, session_size=1)
 
             if not session_problems:
                 return jsonify({'error': 'No more problems available'}), 404
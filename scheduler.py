@@ -1,7 +1,16 @@
 from datetime import datetime, timedelta
 import random
+import time
+from sqlalchemy import event, func, or_, and_
+from sqlalchemy.orm import Session as OrmSession, contains_eager
 from config import Config
 
+# Last get_study_stats() result over all active problems, as a (key, stats)
+# entry. The key pairs the commit generation, bumped on every commit in this
+# process, with the current minute since due counts depend on the time - the
+# minute also bounds how long commits from other processes go unnoticed
+_study_stats_cache = {'generation': 0, 'entry': None}
+
 def calculate_effective_rating(new_rating, problem_id, problem_stats):
     """
     Calculate effective rating using performance history to prevent jumping.
@@ -111,12 +120,12 @@ def calculate_next_review(rating, current_interval_hours, easiness_factor, repet
 
     return next_interval, new_easiness_factor
 
-def get_due_problems(problems_with_stats, limit=None, randomize=True):
+def get_due_problems(problems, limit=None, randomize=True):
     """
     Get problems that are due for review.
 
     Args:
-        problems_with_stats: List of (Problem, ProblemStats) tuples
+        problems: List of Problem objects with stats loaded
         limit: Maximum number of problems to return
         randomize: Whether to randomize the order
 
@@ -126,10 +135,11 @@ def get_due_problems(problems_with_stats, limit=None, randomize=True):
     now = datetime.utcnow()
     due_problems = []
 
-    for problem, stats in problems_with_stats:
+    for problem in problems:
         if not problem.is_active:
             continue
 
+        stats = problem.stats
         if stats is None or stats.next_review <= now:
             due_problems.append(problem)
 
@@ -162,7 +172,7 @@ def get_due_problems(problems_with_stats, limit=None, randomize=True):
 
     return due_problems
 
-def get_session_problems(all_problems_with_stats, session_size=1):
+def get_session_problems(all_problems, session_size=1):
     """
     Get problems for a practice session with balanced mix of new and review problems.
 
@@ -173,7 +183,7 @@ def get_session_problems(all_problems_with_stats, session_size=1):
     - Mix in new problems even when many reviews are due
 
     Args:
-        all_problems_with_stats: List of (Problem, ProblemStats) tuples
+        all_problems: List of Problem objects with stats loaded
         session_size: Target number of problems (default 1 for dynamic loading)
 
     Returns:
@@ -181,7 +191,7 @@ def get_session_problems(all_problems_with_stats, session_size=1):
     """
     if session_size == 1:
         # Dynamic loading mode - return next single problem with smart selection
-        return get_next_problem(all_problems_with_stats)
+        return get_next_problem(all_problems)
 
     # Legacy batch mode (kept for compatibility)
     now = datetime.utcnow()
@@ -192,10 +202,11 @@ def get_session_problems(all_problems_with_stats, session_size=1):
     failed_recent = []          # Recently had issues (Failed/Solution/Errors)
     reinforcement_problems = [] # Recent low ratings but not due
 
-    for problem, stats in all_problems_with_stats:
+    for problem in all_problems:
         if not problem.is_active:
             continue
 
+        stats = problem.stats
         if stats is None:
             # New problem - never reviewed
             new_problems.append(problem)
@@ -241,7 +252,44 @@ def get_session_problems(all_problems_with_stats, session_size=1):
 
     return selected_problems
 
-def get_next_problem(all_problems_with_stats):
+def query_session_candidates(exclude_problem_ids=None):
+    """
+    Fetch the problems the session scheduler could pick: new, due, or
+    recently reviewed with a low average rating.
+
+    The filter runs in SQL so problems that aren't due yet are never loaded
+    as objects. SQLite still walks every active problem (ix_problems_active)
+    and probes its stats row - the OR across new, due and recently reviewed
+    problems keeps it from using ix_stats_next_review.
+
+    Args:
+        exclude_problem_ids: Optional subquery/list of problem IDs to skip
+
+    Returns:
+        List of Problem objects with stats loaded
+    """
+    # Import here to avoid circular import
+    from models import Problem, ProblemStats
+
+    now = datetime.utcnow()
+    # Populate problem.stats from the join the filter needs anyway
+    query = Problem.query.outerjoin(Problem.stats).options(contains_eager(Problem.stats)).filter(
+        Problem.is_active == True,
+        or_(
+            ProblemStats.problem_id.is_(None),
+            ProblemStats.next_review <= now,
+            and_(ProblemStats.last_reviewed > now - timedelta(days=1),
+                 ProblemStats.average_rating > 0,
+                 ProblemStats.average_rating < 3.5)
+        )
+    )
+
+    if exclude_problem_ids is not None:
+        query = query.filter(~Problem.id.in_(exclude_problem_ids))
+
+    return query.all()
+
+def get_next_problem(all_problems):
     """
     Get the next single problem using smart prioritization.
     This is used for time-based sessions with dynamic loading.
@@ -251,10 +299,11 @@ def get_next_problem(all_problems_with_stats):
     # Categorize and score problems
     problem_scores = []
 
-    for problem, stats in all_problems_with_stats:
+    for problem in all_problems:
         if not problem.is_active:
             continue
 
+        stats = problem.stats
         score = 0
         category = ""
 
@@ -298,68 +347,93 @@ def get_next_problem(all_problems_with_stats):
 
     return [problem_scores[0][0]]
 
-def get_study_stats(problems_with_stats):
+def get_study_stats():
     """
-    Calculate study statistics.
+    Calculate study statistics over all active problems.
+
+    Every count is aggregated by SQLite in a single pass over
+    problems LEFT JOIN problem_stats, so no rows are loaded.
 
     Returns:
         Dictionary with study statistics
     """
+    # Import here to avoid circular import
+    from models import db, Problem, ProblemStats
+
     now = datetime.utcnow()
-    stats = {
-        'total_problems': 0,
-        'due_now': 0,
-        'due_today': 0,
-        'due_this_week': 0,
-        'by_difficulty': {'Easy': 0, 'Medium': 0, 'Hard': 0, 'Unknown': 0},
-        'by_rating': {0: 0, 1: 0, 2: 0, 3: 0, 4: 0, 5: 0},
-        'average_rating': 0,
-        'total_reviews': 0,
-        'problems_mastered': 0  # Rating >= 4 and interval > 24 hours
+    reviewed = ProblemStats.problem_id.isnot(None)
+    rated = ProblemStats.last_rating.isnot(None)
+    difficulties = ('Easy', 'Medium', 'Hard')
+    ratings = range(6)
+
+    columns = [
+        func.count(),
+        # New problems (no stats yet) are due now
+        func.count().filter(or_(~reviewed, ProblemStats.next_review <= now)),
+        func.count().filter(ProblemStats.next_review > now,
+                            ProblemStats.next_review <= now + timedelta(hours=24)),
+        func.count().filter(ProblemStats.next_review > now + timedelta(hours=24),
+                            ProblemStats.next_review <= now + timedelta(days=7)),
+        func.count().filter(rated),
+        func.sum(func.coalesce(func.nullif(ProblemStats.average_rating, 0), ProblemStats.last_rating)).filter(rated),
+        func.sum(ProblemStats.total_reviews),
+        # Mastered problems (high rating and long interval)
+        func.count().filter(ProblemStats.average_rating >= 4, ProblemStats.interval_hours > 24),
+    ]
+    columns += [func.count().filter(Problem.difficulty == difficulty) for difficulty in difficulties]
+    columns += [func.count().filter(ProblemStats.last_rating == rating) for rating in ratings]
+
+    row = db.session.execute(
+        db.select(*columns)
+        .select_from(Problem)
+        .outerjoin(ProblemStats)
+        .where(Problem.is_active == True)
+    ).one()
+
+    (total_problems, due_now, due_today, due_this_week,
+     rated_problems, total_rating_sum, total_reviews, problems_mastered) = row[:8]
+    difficulty_counts = row[8:8 + len(difficulties)]
+    rating_counts = row[8 + len(difficulties):]
+
+    by_difficulty = dict(zip(difficulties, difficulty_counts))
+    by_difficulty['Unknown'] = total_problems - sum(difficulty_counts)
+
+    return {
+        'total_problems': total_problems,
+        'due_now': due_now,
+        'due_today': due_today,
+        'due_this_week': due_this_week,
+        'by_difficulty': by_difficulty,
+        'by_rating': dict(zip(ratings, rating_counts)),
+        'average_rating': total_rating_sum / rated_problems if rated_problems else 0,
+        'total_reviews': total_reviews or 0,
+        'problems_mastered': problems_mastered  # Rating >= 4 and interval > 24 hours
     }
 
-    total_rating_sum = 0
-    rated_problems = 0
+@event.listens_for(OrmSession, 'after_commit')
+def invalidate_study_stats(session):
+    """Drop the cached study statistics once problems or reviews may have changed"""
+    _study_stats_cache['generation'] += 1
 
-    for problem, problem_stats in problems_with_stats:
-        if not problem.is_active:
-            continue
+def get_cached_study_stats():
+    """
+    Get study statistics for all active problems, reusing the last result
+    until the next commit or until the minute rolls over.
 
-        stats['total_problems'] += 1
+    Returns:
+        Dictionary with study statistics
+    """
+    generation = _study_stats_cache['generation']
+    key = (generation, int(time.time() // 60))
+    entry = _study_stats_cache['entry']
+    if entry is not None and entry[0] == key:
+        return entry[1]
 
-        # Count by difficulty
-        difficulty = problem.difficulty or 'Unknown'
-        if difficulty in stats['by_difficulty']:
-            stats['by_difficulty'][difficulty] += 1
-        else:
-            stats['by_difficulty']['Unknown'] += 1
-
-        if problem_stats:
-            # Due calculations
-            if problem_stats.next_review <= now:
-                stats['due_now'] += 1
-            elif problem_stats.next_review <= now + timedelta(hours=24):
-                stats['due_today'] += 1
-            elif problem_stats.next_review <= now + timedelta(days=7):
-                stats['due_this_week'] += 1
-
-            # Rating statistics
-            if problem_stats.last_rating is not None:
-                stats['by_rating'][problem_stats.last_rating] += 1
-                total_rating_sum += problem_stats.average_rating or problem_stats.last_rating
-                rated_problems += 1
-
-            stats['total_reviews'] += problem_stats.total_reviews
-
-            # Mastered problems (high rating and long interval)
-            if (problem_stats.average_rating and problem_stats.average_rating >= 4 and
-                problem_stats.interval_hours > 24):
-                stats['problems_mastered'] += 1
-        else:
-            # New problem, due now
-            stats['due_now'] += 1
+    stats = get_study_stats()
 
-    if rated_problems > 0:
-        stats['average_rating'] = total_rating_sum / rated_problems
+    # Only keep the result if nothing committed while it was computed -
+    # otherwise it may predate that commit
+    if _study_stats_cache['generation'] == generation:
+        _study_stats_cache['entry'] = (key, stats)
 
-    return stats
\ No newline at end of file
+    return stats
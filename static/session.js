@@ -197,7 +197,7 @@ function submitRating(rating) {
                     timerInterval = null;
                 }
                 alert('Session completed! Time limit reached.');
-                completeSession();
+                completeSession(data.session_completed);
                 return;
             }
 
@@ -510,7 +510,7 @@ function updateProgress() {
     document.getElementById('problems-completed').textContent = reviewedProblems;
 }
 
-function completeSession() {
+function completeSession(completedOnServer = false) {
     // Mark session as completed and stop timer
     sessionCompleted = true;
     if (timerInterval) {
@@ -546,6 +546,11 @@ function completeSession() {
         </div>
     `;
 
+    // The review that hit the time limit already completed it on the server
+    if (completedOnServer) {
+        return;
+    }
+
     // Complete session on server
     fetch('/session/complete', {
         method: 'POST',
@@ -3,20 +3,27 @@ Utility functions for LeetCode SRS application.
 """
 
 import re
-from urllib.parse import urlparse
+from functools import lru_cache
+from sqlalchemy import case, or_
+from sqlalchemy.orm import defer
 from models import Problem
 
+_PROBLEM_NUMBER_RE = re.compile(r'/problems/(\d+)-')
 
+# The URL helpers are pure and see the same URLs over and over (bookmarklet
+# re-adds, bulk imports of an earlier export), so results are memoized
+URL_CACHE_SIZE = 4096
+
+
+@lru_cache(maxsize=URL_CACHE_SIZE)
 def normalize_leetcode_url(url):
     """Normalize LeetCode URL by removing query parameters and fragments"""
     if not url:
         return url
 
-    # Parse the URL
-    parsed = urlparse(url)
-
-    # Rebuild without query parameters and fragments
-    normalized = f"{parsed.scheme}://{parsed.netloc}{parsed.path}"
+    # Drop the fragment and query string - plain string splits are all a
+    # LeetCode URL needs, and much cheaper than urlparse
+    normalized = url.partition('#')[0].partition('?')[0]
 
     # Remove trailing slash
     if normalized.endswith('/'):
@@ -25,13 +32,21 @@ def normalize_leetcode_url(url):
     return normalized
 
 
+@lru_cache(maxsize=URL_CACHE_SIZE)
 def extract_problem_number_from_url(url):
     """Extract problem number from LeetCode URL"""
     if not url:
         return None
 
-    # Try to extract from URL path like /problems/123-two-sum/
-    match = re.search(r'/problems/(\d+)-', url)
+    # Try to extract from URL path like /problems/123-two-sum/ - plain string
+    # ops handle the usual shape, the regex covers everything else
+    start = url.find('/problems/')
+    if start >= 0:
+        digits, dash, _ = url[start + len('/problems/'):].partition('-')
+        if dash and digits.isdecimal():
+            return int(digits)
+
+    match = _PROBLEM_NUMBER_RE.search(url)
     if match:
         return int(match.group(1))
 
@@ -42,26 +57,21 @@ def check_duplicate_problem(url, number=None):
     """Check if problem already exists by URL or number"""
     normalized_url = normalize_leetcode_url(url)
 
-    # Check by normalized URL first
-    existing_by_url = Problem.query.filter_by(url=normalized_url, is_active=True).first()
-    if existing_by_url:
-        return existing_by_url
-
-    # Check by problem number if available
-    if number:
-        existing_by_number = Problem.query.filter_by(number=number, is_active=True).first()
-        if existing_by_number:
-            return existing_by_number
-
     # Extract number from URL if not provided
     if not number:
         number = extract_problem_number_from_url(url)
-        if number:
-            existing_by_number = Problem.query.filter_by(number=number, is_active=True).first()
-            if existing_by_number:
-                return existing_by_number
 
-    return None
+    filters = [Problem.url == normalized_url]
+    if number:
+        filters.append(Problem.number == number)
+
+    # One query for both checks - a URL match takes precedence over a number match.
+    # The description (full problem HTML) is only loaded if a caller reads it
+    return (Problem.query
+            .options(defer(Problem.description))
+            .filter(Problem.is_active == True, or_(*filters))
+            .order_by(case((Problem.url == normalized_url, 0), else_=1), Problem.id)
+            .first())
 
 
 def get_data_directory():